@@ -5,13 +5,21 @@ from flask import Flask, jsonify
 
 load_dotenv()
 
+# environment is read once per process, not on every create_app() call
+_ENV_CONFIG = {
+    'SECRET_KEY': os.environ.get('SECRET_KEY', 'dev'),
+    'DATABASE_URL': os.environ.get('DATABASE_URL'),
+    # caching is off unless configured; per-process caches (SimpleCache) only
+    # see their own invalidations, so use RedisCache with several workers
+    'CACHE_TYPE': os.environ.get('CACHE_TYPE', 'NullCache'),
+    'CACHE_NO_NULL_WARNING': True,
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL'),
+}
+
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_mapping(
-        SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
-        DATABASE_URL=os.environ.get('DATABASE_URL'),
-    )
+    app.config.from_mapping(_ENV_CONFIG)
 
     if test_config is None:
         # load the instance config, if it exists, when not testing
@@ -29,6 +37,15 @@ def create_app(test_config=None):
     from . import db
     db.init_app(app)
 
+    from . import cache
+    cache.init_app(app)
+
+    # accept a trailing slash (/users/) instead of answering 404; must be set
+    # before the blueprints register their rules
+    app.url_map.strict_slashes = False
+    # no indentation/whitespace in jsonify output, even in debug mode
+    app.json.compact = True
+
     from . import users 
     app.register_blueprint(users.bp)
 
@@ -0,0 +1,21 @@
+from flask import g, request
+
+from .db import MAX_ID
+
+
+def get_current_user_id() -> int | None:
+    """Dev-only auth: read the current user id from the X-User-Id header."""
+    if 'current_user_id' not in g:
+        # WSGI exposes X-User-Id as HTTP_X_USER_ID; skip the headers view
+        g.current_user_id = _parse_user_id(request.environ.get('HTTP_X_USER_ID'))
+    return g.current_user_id
+
+
+def _parse_user_id(raw: str | None) -> int | None:
+    # isdigit() alone also accepts non-ASCII digits such as '١' or '²'
+    if raw and raw.isascii() and raw.isdigit():
+        user_id = int(raw)
+        # ids past int4 cannot exist and would overflow the INSERT parameters
+        if user_id <= MAX_ID:
+            return user_id
+    return None
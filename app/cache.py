@@ -0,0 +1,7 @@
+from flask_caching import Cache
+
+cache = Cache()
+
+
+def init_app(app):
+    cache.init_app(app)
@@ -1,16 +1,103 @@
 import click
-import json
-import psycopg2
+import orjson
+import os
+import threading
+import weakref
 from flask import current_app, g
 from flask.cli import with_appcontext 
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values, register_default_jsonb
+from psycopg2.pool import ThreadedConnectionPool
+
+_pool_lock = threading.Lock()
+
+# largest value a SERIAL (int4) id column can hold; bigger ids cannot exist and
+# would overflow the int parameters of prepared statements
+MAX_ID = 2**31 - 1
+
+# jsonb columns come back already parsed; decode them with orjson
+register_default_jsonb(globally=True, loads=orjson.loads)
+
+
+def jsonb(value):
+    """Encode a Python value as JSON text for a jsonb query parameter.
+
+    Encoding happens here, not when psycopg2 adapts the parameter, so callers
+    can catch orjson.JSONEncodeError (e.g. integers beyond 64 bits).
+    """
+    return orjson.dumps(value).decode()
+
+
+# name -> (PREPARE sql, EXECUTE sql) for statements registered with prepare()
+_statements = {}
+# connection -> names already PREPAREd on that server session
+_prepared = weakref.WeakKeyDictionary()
+
+
+def prepare(name, param_types, query):
+    """Register a server-side prepared statement, run with execute_prepared().
+
+    Parameters in ``query`` use ``$1``, ``$2``... placeholders, typed by
+    ``param_types`` (e.g. ``('int', 'text')``).
+    """
+    if param_types:
+        signature = f"{name}({', '.join(param_types)})"
+        call = f"EXECUTE {name}({', '.join(['%s'] * len(param_types))});"
+    else:
+        signature = name
+        call = f"EXECUTE {name};"
+    _statements[name] = (f"PREPARE {signature} AS {query}", call)
+
+
+def execute_prepared(cur, name, params=()):
+    """Execute a prepared statement, PREPAREing it on first use per connection.
+
+    Prepared statements live for the whole server session and are not
+    undone by a rollback, so each pooled connection parses the SQL once.
+    """
+    prepare_sql, execute_sql = _statements[name]
+    done = _prepared.setdefault(cur.connection, set())
+    if name not in done:
+        cur.execute(prepare_sql)
+        done.add(name)
+    cur.execute(execute_sql, params)
+
+
+def get_pool():
+    """Return this process's connection pool, creating it on first use.
+
+    The pool is tagged with the pid that created it, so a worker forked
+    from a parent that already opened one (e.g. gunicorn --preload)
+    builds its own instead of sharing the parent's sockets.
+    """
+    pid = os.getpid()
+    entry = current_app.extensions.get('pgpool')
+    if entry is None or entry[0] != pid:
+        with _pool_lock:
+            entry = current_app.extensions.get('pgpool')
+            if entry is None or entry[0] != pid:
+                database_url = current_app.config.get('DATABASE_URL')
+                if not database_url:
+                    raise RuntimeError('DATABASE_URL is not configured.')
+                pool = ThreadedConnectionPool(
+                    minconn=current_app.config.get('DATABASE_POOL_MIN', 2),
+                    maxconn=current_app.config.get('DATABASE_POOL_MAX', 20),
+                    dsn=database_url,
+                    cursor_factory=RealDictCursor,
+                )
+                entry = (pid, pool)
+                current_app.extensions['pgpool'] = entry
+    return entry[1]
+
 
 def get_db():
     if 'db' not in g:
-        database_url = current_app.config.get('DATABASE_URL')
-        if not database_url:
-            raise RuntimeError('DATABASE_URL is not configured.')
-        g.db = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+        db = get_pool().getconn()
+        # Handlers issue one statement each, so let it commit on its own
+        # instead of paying a separate COMMIT round-trip; multi-statement
+        # work opens an explicit transaction with ``with db:``.
+        if not db.autocommit:
+            db.autocommit = True
+        g.db = db
 
     return g.db
 
@@ -19,7 +106,8 @@ def close_db(e=None):
     db = g.pop('db', None)
 
     if db is not None:
-        db.close()
+        # putconn() rolls back any transaction left open by the request
+        get_pool().putconn(db)
 
 
 def init_db():
@@ -30,10 +118,9 @@ def init_db():
         schema_sql = f.read().decode('utf8')
 
     statements = [statement.strip() for statement in schema_sql.split(';') if statement.strip()]
-    with db.cursor() as cursor:
+    with db, db.cursor() as cursor:
         for statement in statements:
             cursor.execute(statement)
-    db.commit()
 
 
 @click.command('init-db')
@@ -58,27 +145,26 @@ def populate_db():
     """
     db = get_db()
 
-    with db.cursor() as cur:
+    with db, db.cursor() as cur:
         # Only populate if empty
         cur.execute("SELECT COUNT(*) AS count FROM users;")
         if cur.fetchone()["count"] > 0:
             return  # already populated, do nothing
 
         # --- Insert users ---
-        cur.execute(
+        users = execute_values(
+            cur,
             """
             INSERT INTO users (first_name, last_name, date_of_birth)
-            VALUES
-                (%s, %s, %s),
-                (%s, %s, %s)
+            VALUES %s
             RETURNING id;
             """,
-            (
-                "Alice", "Owner", "1990-01-01",
-                "Bob", "Landlord", "1985-05-15",
-            ),
+            [
+                ("Alice", "Owner", "1990-01-01"),
+                ("Bob", "Landlord", "1985-05-15"),
+            ],
+            fetch=True,
         )
-        users = cur.fetchall()
         alice_id = users[0]["id"]
         bob_id = users[1]["id"]
 
@@ -111,27 +197,30 @@ def populate_db():
             },
         ]
 
-        for p in properties:
-            cur.execute(
-                """
-                INSERT INTO properties (
-                    name, description, property_type, city,
-                    rooms_count, rooms_details, owner_id
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s);
-                """,
+        # one multi-row INSERT instead of a round-trip per property
+        execute_values(
+            cur,
+            """
+            INSERT INTO properties (
+                name, description, property_type, city,
+                rooms_count, rooms_details, owner_id
+            )
+            VALUES %s;
+            """,
+            [
                 (
                     p["name"],
                     p["description"],
                     p["property_type"],
                     p["city"],
                     p["rooms_count"],
-                    json.dumps(p["rooms_details"]),
+                    jsonb(p["rooms_details"]),
                     p["owner_id"],
-                ),
-            )
-
-    db.commit()
+                )
+                for p in properties
+            ],
+            page_size=100,
+        )
 
 
 @click.command("populate-db")
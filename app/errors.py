@@ -10,6 +10,10 @@ def not_found(error):
 def bad_request(error):
     return jsonify({"error": "bad request"}), 400
 
+@bp.app_errorhandler(413)
+def payload_too_large(error):
+    return jsonify({"error": "payload too large"}), 413
+
 @bp.app_errorhandler(500)
 def server_error(error):
     return jsonify({"error": "internal server error"}), 500
@@ -1,56 +1,63 @@
-import json
+import functools
+from datetime import datetime
 from typing import Any, Dict, List, Tuple
 
-from flask import Blueprint, jsonify, request
+import orjson
+from flask import Blueprint, Response, current_app, jsonify, request
+from psycopg2 import errors
+from psycopg2.extensions import cursor as tuple_cursor
 
-from app.db import get_db
+from app.auth import get_current_user_id
+from app.db import get_db, jsonb
 
 bp = Blueprint('property', __name__, url_prefix='/properties')
 
 
-def get_current_user_id() -> int | None:
-    """Dev-only auth: read current user id from X-User-Id header."""
-    raw = request.headers.get('X-User-Id')
-    if raw is None:
-        return None
-    try:
-        return int(raw)
-    except ValueError:
-        return None
-
+# Column order shared by the list query and _serialize_property_row.
+_PROPERTY_COLUMNS = (
+    'id', 'name', 'description', 'property_type', 'city', 'rooms_count',
+    'rooms_details', 'created_at', 'updated_at', 'owner_id', 'first_name',
+    'last_name',
+)
+(
+    _ID, _NAME, _DESCRIPTION, _PROPERTY_TYPE, _CITY, _ROOMS_COUNT,
+    _ROOMS_DETAILS, _CREATED_AT, _UPDATED_AT, _OWNER_ID, _FIRST_NAME,
+    _LAST_NAME,
+) = range(len(_PROPERTY_COLUMNS))
 
-def _serialize_property(row: Dict[str, Any]) -> Dict[str, Any]:
-    rooms_details = row.get('rooms_details')
-    parsed_rooms: List[Any]
-
-    if isinstance(rooms_details, str) and rooms_details:
-        try:
-            parsed_rooms = json.loads(rooms_details)
-        except json.JSONDecodeError:
-            parsed_rooms = []
-    elif isinstance(rooms_details, list):
-        parsed_rooms = rooms_details
-    else:
-        parsed_rooms = []
 
+def _serialize_property_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Serialize a plain tuple row laid out as _PROPERTY_COLUMNS."""
     return {
-        "id": row["id"],
-        "name": row["name"],
-        "description": row["description"],
-        "property_type": row["property_type"],
-        "city": row["city"],
-        "rooms_count": row["rooms_count"],
-        "rooms_details": parsed_rooms,
-        "created_at": row["created_at"],
-        "updated_at": row["updated_at"],
+        "id": row[_ID],
+        "name": row[_NAME],
+        "description": row[_DESCRIPTION],
+        "property_type": row[_PROPERTY_TYPE],
+        "city": row[_CITY],
+        "rooms_count": row[_ROOMS_COUNT],
+        "rooms_details": row[_ROOMS_DETAILS] or [],
+        "created_at": row[_CREATED_AT],
+        "updated_at": row[_UPDATED_AT],
         "owner": {
-            "id": row["owner_id"],
-            "first_name": row["first_name"],
-            "last_name": row["last_name"],
+            "id": row[_OWNER_ID],
+            "first_name": row[_FIRST_NAME],
+            "last_name": row[_LAST_NAME],
         },
     }
 
 
+def _serialize_property(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a RealDictCursor row (single-property endpoints)."""
+    return _serialize_property_row(tuple(row[column] for column in _PROPERTY_COLUMNS))
+
+
+def _json_response(obj: Any, status: int = 200) -> Response:
+    """Encode a success payload with orjson; error paths keep using jsonify."""
+    return current_app.response_class(
+        orjson.dumps(obj), status=status, mimetype='application/json'
+    )
+
+
 def _fetch_property(property_id: int) -> Dict[str, Any] | None:
     db = get_db()
     with db.cursor() as cur:
@@ -67,9 +74,18 @@ def _fetch_property(property_id: int) -> Dict[str, Any] | None:
     return row
 
 
+def _fetch_owner_id(property_id: int) -> int | None:
+    """Return the owner id of a property, or None if it does not exist."""
+    db = get_db()
+    with db.cursor() as cur:
+        cur.execute("SELECT owner_id FROM properties WHERE id = %s;", (property_id,))
+        row = cur.fetchone()
+    return None if row is None else row['owner_id']
+
+
 @bp.get('')
 def list_properties():
-    """List all properties, optionally filtered by city, with simple pagination."""
+    """List all properties, optionally filtered by city, with keyset pagination."""
     db = get_db()
 
     # City is required in filter
@@ -78,45 +94,71 @@ def list_properties():
         return jsonify({"error": "city query parameter is required"}), 400
 
     # pagination
-    try:
-        page = int(request.args.get("page", 1))
-    except (TypeError, ValueError):
-        page = 1
-
     try:
         page_size = int(request.args.get("page_size", 20))
     except (TypeError, ValueError):
         page_size = 20
 
-    page = max(page, 1)
     page_size = max(min(page_size, 100), 1)
-    offset = (page - 1) * page_size
 
-    city = (request.args.get('city') or '').strip()
+    # keyset cursor: (created_at, id) of the last row of the previous page
+    after_created_at = request.args.get("after_created_at")
+    after_id = request.args.get("after_id")
+    if (after_created_at is None) != (after_id is None):
+        return jsonify({"error": "after_created_at and after_id must be given together"}), 400
+    if after_id is not None:
+        try:
+            after_created_at = datetime.fromisoformat(after_created_at)
+            after_id = int(after_id)
+        except ValueError:
+            return jsonify({"error": "invalid pagination cursor"}), 400
 
     base_query = """
-        SELECT p.*, u.first_name, u.last_name
+        SELECT p.id, p.name, p.description, p.property_type, p.city,
+               p.rooms_count, p.rooms_details, p.created_at, p.updated_at,
+               p.owner_id, u.first_name, u.last_name
         FROM properties p
         JOIN users u ON p.owner_id = u.id
     """
+    conditions: List[str] = []
     params: List[Any] = []
 
     if city:
-        base_query += " WHERE LOWER(p.city) = LOWER(%s)"
+        conditions.append("LOWER(p.city) = LOWER(%s)")
         params.append(city)
 
-    base_query += " ORDER BY p.created_at DESC LIMIT %s OFFSET %s"
-    params.extend([page_size, offset])
+    if after_id is not None:
+        conditions.append("(p.created_at, p.id) < (%s, %s)")
+        params.extend([after_created_at, after_id])
 
-    with db.cursor() as cur:
+    if conditions:
+        base_query += " WHERE " + " AND ".join(conditions)
+
+    # fetch one extra row to know whether another page exists
+    base_query += " ORDER BY p.created_at DESC, p.id DESC LIMIT %s"
+    params.append(page_size + 1)
+
+    # plain tuple cursor: avoids building a dict per row on up to 100 rows.
+    # Keep it client-side: named (server-side) cursors are several times
+    # slower for pages this small and only pay off on large export scans.
+    with db.cursor(cursor_factory=tuple_cursor) as cur:
         cur.execute(base_query, tuple(params))
         rows = cur.fetchall()
 
-    return jsonify({
-        "properties": [_serialize_property(row) for row in rows],
-        "page": page,
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = {
+            "after_created_at": last[_CREATED_AT].isoformat(),
+            "after_id": last[_ID],
+        }
+
+    return _json_response({
+        "properties": [_serialize_property_row(row) for row in rows],
         "page_size": page_size,
-    }), 200
+        "next_cursor": next_cursor,
+    })
 
 
 @bp.get('/<int:property_id>')
@@ -125,7 +167,7 @@ def retrieve_property(property_id: int):
     property_row = _fetch_property(property_id)
     if property_row is None:
         return jsonify({"error": "property not found"}), 404
-    return jsonify({"property": _serialize_property(property_row)}), 200
+    return _json_response({"property": _serialize_property(property_row)})
 
 
 def _extract_property_payload(
@@ -151,10 +193,13 @@ def _extract_property_payload(
             rooms_details_value = []
         if not isinstance(rooms_details_value, list):
             return None, "rooms_details must be a list"
-        fields['rooms_details'] = json.dumps(rooms_details_value)
+        try:
+            fields['rooms_details'] = jsonb(rooms_details_value)
+        except orjson.JSONEncodeError:
+            return None, "rooms_details contains unsupported values"
     elif not partial:
         rooms_details_value = []
-        fields['rooms_details'] = json.dumps(rooms_details_value)
+        fields['rooms_details'] = jsonb(rooms_details_value)
 
     rooms_count_provided = 'rooms_count' in payload
     rooms_count_value = payload.get('rooms_count')
@@ -175,6 +220,38 @@ def _extract_property_payload(
     return fields, None
 
 
+_INSERT_PROPERTY_SQL = """
+    WITH inserted AS (
+        INSERT INTO properties (
+            name, description, property_type, city,
+            rooms_count, rooms_details, owner_id
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING *
+    )
+    SELECT inserted.*, u.first_name, u.last_name
+    FROM inserted
+    JOIN users u ON inserted.owner_id = u.id;
+"""
+
+
+@functools.lru_cache(maxsize=64)
+def _build_update_sql(columns: Tuple[str, ...]) -> str:
+    """Build the UPDATE statement for a given set of columns, once per set."""
+    assignments = ', '.join(f"{column} = %s" for column in columns)
+    assignments += ', updated_at = CURRENT_TIMESTAMP'
+    return f"""
+        WITH updated AS (
+            UPDATE properties SET {assignments}
+            WHERE id = %s AND owner_id = %s
+            RETURNING *
+        )
+        SELECT updated.*, u.first_name, u.last_name
+        FROM updated
+        JOIN users u ON updated.owner_id = u.id;
+    """
+
+
 @bp.post('')
 def create_property():
     """Create a new property owned by the current user."""
@@ -189,37 +266,26 @@ def create_property():
 
     db = get_db()
 
-    # Optional: ensure owner exists
-    with db.cursor() as cur:
-        cur.execute("SELECT id FROM users WHERE id = %s;", (current_user_id,))
-        owner = cur.fetchone()
-        if owner is None:
-            return jsonify({"error": "owner user not found"}), 400
-
-        cur.execute(
-            """
-            INSERT INTO properties (
-                name, description, property_type, city,
-                rooms_count, rooms_details, owner_id
+    # the owner_id foreign key rejects unknown users, no need to pre-check
+    try:
+        with db.cursor() as cur:
+            cur.execute(
+                _INSERT_PROPERTY_SQL,
+                (
+                    fields['name'],
+                    fields['description'],
+                    fields['property_type'],
+                    fields['city'],
+                    fields['rooms_count'],
+                    fields['rooms_details'],
+                    current_user_id,
+                ),
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
-            """,
-            (
-                fields['name'],
-                fields['description'],
-                fields['property_type'],
-                fields['city'],
-                fields['rooms_count'],
-                fields['rooms_details'],
-                current_user_id,
-            ),
-        )
-        inserted = cur.fetchone()
+            created = cur.fetchone()
+    except errors.ForeignKeyViolation:
+        return jsonify({"error": "owner user not found"}), 400
 
-    db.commit()
-    created_at = _fetch_property(inserted['id'])
-    return jsonify({"property": _serialize_property(created_at)}), 201
+    return _json_response({"property": _serialize_property(created)}, status=201)
 
 
 @bp.route('/<int:property_id>', methods=('PUT', 'PATCH'))
@@ -229,13 +295,6 @@ def update_property(property_id: int):
     if current_user_id is None:
         return jsonify({"error": "X-User-Id header is required"}), 401
 
-    property_row = _fetch_property(property_id)
-    if property_row is None:
-        return jsonify({"error": "property not found"}), 404
-
-    if property_row['owner_id'] != current_user_id:
-        return jsonify({"error": "you can only edit your own properties"}), 403
-
     payload = request.get_json(silent=True) or {}
     fields, error = _extract_property_payload(payload, partial=True)
     if error:
@@ -243,17 +302,20 @@ def update_property(property_id: int):
     if not fields:
         return jsonify({"error": "nothing to update"}), 400
 
-    assignments = ', '.join(f"{column} = %s" for column in fields.keys())
-    assignments += ', updated_at = CURRENT_TIMESTAMP'
-    values = tuple(list(fields.values()) + [property_id])
+    values = tuple(list(fields.values()) + [property_id, current_user_id])
 
+    # the ownership check is part of the UPDATE's WHERE clause
     db = get_db()
     with db.cursor() as cur:
-        cur.execute(f'UPDATE properties SET {assignments} WHERE id = %s;', values)
-    db.commit()
+        cur.execute(_build_update_sql(tuple(fields.keys())), values)
+        updated = cur.fetchone()
+
+    if updated is None:
+        if _fetch_owner_id(property_id) is None:
+            return jsonify({"error": "property not found"}), 404
+        return jsonify({"error": "you can only edit your own properties"}), 403
 
-    updated_at = _fetch_property(property_id)
-    return jsonify({"property": _serialize_property(updated_at)}), 200
+    return _json_response({"property": _serialize_property(updated)})
 
 
 @bp.delete('/<int:property_id>')
@@ -263,15 +325,17 @@ def delete_property(property_id: int):
     if current_user_id is None:
         return jsonify({"error": "X-User-Id header is required"}), 401
 
-    property_row = _fetch_property(property_id)
-    if property_row is None:
-        return jsonify({"error": "property not found"}), 404
+    db = get_db()
+    with db.cursor() as cur:
+        cur.execute(
+            'DELETE FROM properties WHERE id = %s AND owner_id = %s RETURNING id;',
+            (property_id, current_user_id),
+        )
+        deleted = cur.fetchone()
 
-    if property_row['owner_id'] != current_user_id:
+    if deleted is None:
+        if _fetch_owner_id(property_id) is None:
+            return jsonify({"error": "property not found"}), 404
         return jsonify({"error": "you can only delete your own properties"}), 403
 
-    db = get_db()
-    with db.cursor() as cur:
-        cur.execute('DELETE FROM properties WHERE id = %s;', (property_id,))
-    db.commit()
     return jsonify({"message": "property deleted"}), 200
@@ -19,5 +19,11 @@ CREATE TABLE properties (
   property_type TEXT NOT NULL,
   city TEXT NOT NULL,
   rooms_count INTEGER NOT NULL DEFAULT 0,
-  rooms_details TEXT
+  rooms_details JSONB
 );
+
+CREATE INDEX IF NOT EXISTS properties_city_lower_created_idx
+  ON properties (LOWER(city), created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS properties_owner_id_idx
+  ON properties (owner_id);
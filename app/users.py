@@ -1,58 +1,136 @@
-from datetime import date
+import base64
+import re
 
-from flask import Blueprint, request, jsonify, abort
+import orjson
+from flask import Blueprint, current_app, request, jsonify, abort
+from psycopg2 import errors
 
-from .db import get_db
+from .auth import get_current_user_id
+from .cache import cache
+from .db import MAX_ID, execute_prepared, get_db, prepare
 
 bp = Blueprint('users', __name__, url_prefix='/users')
 
 
+def _error(message: str, status: int) -> tuple:
+    """Encode a constant error response once, at import time."""
+    return orjson.dumps({'error': message}), status, {'Content-Type': 'application/json'}
+
+
+_ERR_MISSING_FIELDS = _error('first_name, last_name and date_of_birth are required', 400)
+_ERR_DOB_FORMAT = _error('date_of_birth must be YYYY-MM-DD', 400)
+_ERR_NO_AUTH = _error('X-User-Id header is required', 401)
+_ERR_FORBIDDEN = _error('forbidden: you can only update your own user', 403)
+_ERR_NO_UPDATE_FIELDS = _error('no supported fields to update', 400)
+_ERR_INVALID_CURSOR = _error('invalid cursor', 400)
+
+# what the DATE cast of date_of_birth raises; other data errors are real bugs
+_DATE_CAST_ERRORS = (errors.InvalidDatetimeFormat, errors.DatetimeFieldOverflow)
+
+# shape check only; the DATE cast in Postgres rejects impossible dates
+_DOB_RE = re.compile(r'\A\d{4}-\d{2}-\d{2}\Z', re.ASCII)
+
+# user payloads are three short fields; reading stops with a 413 past this size
+_MAX_BODY_BYTES = 4096
+
+prepare(
+    'users_insert', ('text', 'text', 'date'),
+    """
+    INSERT INTO users (first_name, last_name, date_of_birth)
+    VALUES ($1, $2, $3)
+    RETURNING id
+    """,
+)
+prepare(
+    'users_get', ('int',),
+    """
+    SELECT id, first_name, last_name,
+           to_char(date_of_birth, 'YYYY-MM-DD') AS date_of_birth
+    FROM users
+    WHERE id = $1
+    """,
+)
+prepare(
+    'users_update', ('text', 'text', 'boolean', 'date', 'int'),
+    """
+    UPDATE users
+    SET first_name = COALESCE($1, first_name),
+        last_name = COALESCE($2, last_name),
+        date_of_birth = CASE WHEN $3 THEN $4 ELSE date_of_birth END
+    WHERE id = $5
+      AND (first_name, last_name, date_of_birth) IS DISTINCT FROM (
+          COALESCE($1, first_name),
+          COALESCE($2, last_name),
+          CASE WHEN $3 THEN $4 ELSE date_of_birth END
+      )
+    RETURNING id
+    """,
+)
+prepare(
+    'users_exists', ('int',),
+    """
+    SELECT 1 FROM users WHERE id = $1
+    """,
+)
+prepare(
+    'users_list_page', ('int', 'int'),
+    """
+    SELECT id, first_name, last_name,
+           to_char(date_of_birth, 'YYYY-MM-DD') AS date_of_birth
+    FROM users
+    WHERE id > $1
+    ORDER BY id
+    LIMIT $2
+    """,
+)
+
+
+def _read_json_body() -> dict:
+    """Parse the request body as a JSON object with orjson."""
+    # bounds chunked bodies too; werkzeug stops reading at the limit without
+    # raising, so allow one extra byte to tell a full body from an oversized one
+    request.max_content_length = _MAX_BODY_BYTES + 1
+    raw = request.get_data(cache=False)
+    if len(raw) > _MAX_BODY_BYTES:
+        abort(413)
+    if not raw:
+        return {}
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        abort(400)
+    if not isinstance(data, dict):
+        abort(400)
+    return data
+
+
 @bp.post('')
 def create_user():
     """Create a user with first_name, last_name and date_of_birth (YYYY-MM-DD)."""
-    data = request.get_json() or {}
+    data = _read_json_body()
 
     first_name = data.get('first_name')
     last_name = data.get('last_name')
     dob_str = data.get('date_of_birth')
 
     if not first_name or not last_name or not dob_str:
-        return jsonify({'error': 'first_name, last_name and date_of_birth are required'}), 400
+        return _ERR_MISSING_FIELDS
 
-    dob = None
-    if dob_str:
-        try:
-            year, month, day = map(int, dob_str.split('-'))
-            dob = date(year, month, day)
-        except ValueError:
-            return jsonify({'error': 'date_of_birth must be YYYY-MM-DD'}), 400
+    if not isinstance(dob_str, str) or not _DOB_RE.match(dob_str):
+        return _ERR_DOB_FORMAT
 
+    # Postgres casts the string to DATE and rejects impossible dates
     db = get_db()
-    with db.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO users (first_name, last_name, date_of_birth)
-            VALUES (%s, %s, %s)
-            RETURNING id;
-            """,
-            (first_name, last_name, dob),
-        )
-        user_id = cur.fetchone()['id']
-    db.commit()
+    try:
+        with db.cursor() as cur:
+            execute_prepared(cur, 'users_insert', (first_name, last_name, dob_str))
+            user_id = cur.fetchone()['id']
+    except _DATE_CAST_ERRORS:
+        return _ERR_DOB_FORMAT
+    cache.delete_memoized(_users_page_body)
 
     return jsonify({'id': user_id}), 201
 
-# read from header a simlation of authentication
-def get_current_user_id() -> int | None:
-    """Read the current user id from the X-User-Id header (dev-only auth)."""
-    raw = request.headers.get('X-User-Id')
-    if raw is None:
-        return None
-    try:
-        return int(raw)
-    except ValueError:
-        return None
-
 @bp.patch('/<int:user_id>')
 def update_user(user_id: int):
     """
@@ -61,113 +139,131 @@ def update_user(user_id: int):
     """
     current_user_id = get_current_user_id()
     if current_user_id is None:
-        return jsonify({'error': 'X-User-Id header is required'}), 401
+        return _ERR_NO_AUTH
 
     if current_user_id != user_id:
-        return jsonify({'error': 'forbidden: you can only update your own user'}), 403
+        return _ERR_FORBIDDEN
 
-    data = request.get_json() or {}
+    data = _read_json_body()
 
     # Only allow updating these fields
     allowed_fields = {'first_name', 'last_name', 'date_of_birth'}
     if not any(field in data for field in allowed_fields):
-        return jsonify({'error': 'no supported fields to update'}), 400
+        return _ERR_NO_UPDATE_FIELDS
+
+    dob_str = data.get('date_of_birth')
+    # null is rejected too: date_of_birth is NOT NULL
+    if 'date_of_birth' in data and (not isinstance(dob_str, str) or not _DOB_RE.match(dob_str)):
+        return _ERR_DOB_FORMAT
 
+    # Single statement: omitted fields keep their current value server-side
     db = get_db()
-    with db.cursor() as cur:
-        # Fetch current values
-        cur.execute(
-            """
-            SELECT id, first_name, last_name, date_of_birth
-            FROM users
-            WHERE id = %s;
-            """,
-            (user_id,),
-        )
-        row = cur.fetchone()
+    try:
+        with db.cursor() as cur:
+            execute_prepared(
+                cur,
+                'users_update',
+                (
+                    data.get('first_name'),
+                    data.get('last_name'),
+                    'date_of_birth' in data,
+                    dob_str,
+                    user_id,
+                ),
+            )
+            updated = cur.fetchone()
+    except _DATE_CAST_ERRORS:
+        return _ERR_DOB_FORMAT
 
-        if row is None:
+    # nothing updated: either no such user, or the values were already set
+    if updated is None:
+        with db.cursor() as cur:
+            execute_prepared(cur, 'users_exists', (user_id,))
+            exists = cur.fetchone() is not None
+        if not exists:
             abort(404)
+        return jsonify({'message': 'no changes'})
 
-        first_name = data.get('first_name', row['first_name'])
-        last_name = data.get('last_name', row['last_name'])
-
-        dob = row['date_of_birth']
-        if 'date_of_birth' in data:
-            dob_str = data['date_of_birth']
-            if dob_str is None:
-                dob = None
-            else:
-                try:
-                    year, month, day = map(int, dob_str.split('-'))
-                    dob = date(year, month, day)
-                except ValueError:
-                    return jsonify({'error': 'date_of_birth must be YYYY-MM-DD'}), 400
-
-        # Apply update
-        cur.execute(
-            """
-            UPDATE users
-            SET first_name = %s,
-                last_name = %s,
-                date_of_birth = %s
-            WHERE id = %s;
-            """,
-            (first_name, last_name, dob, user_id),
-        )
-
-    db.commit()
+    cache.delete_memoized(_user_body, user_id)
+    cache.delete_memoized(_users_page_body)
     return jsonify({'message': 'user updated'})
 
+def _encode_cursor(user_id: int) -> str:
+    """Opaque base64url page cursor wrapping the last returned user id."""
+    return base64.urlsafe_b64encode(str(user_id).encode()).rstrip(b'=').decode()
+
+
+def _decode_cursor(cursor: str) -> int | None:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if raw.isascii() and raw.isdigit() and int(raw) <= MAX_ID:
+        return int(raw)
+    return None
+
+
 @bp.get('')
 def list_users():
-    """Get a list of all users."""
+    """Get a page of users ordered by id, with cursor pagination."""
+    try:
+        limit = int(request.args.get('limit', 50))
+    except (TypeError, ValueError):
+        limit = 50
+    limit = max(min(limit, 200), 1)
+
+    after_id = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        after_id = _decode_cursor(cursor)
+        if after_id is None:
+            return _ERR_INVALID_CURSOR
+
+    # SERIAL ids start at 1, so 0 means the first page
+    body = _users_page_body(after_id or 0, limit)
+    return current_app.response_class(body, mimetype='application/json')
+
+
+@cache.memoize(30)
+def _users_page_body(after_id: int, limit: int) -> bytes:
+    """Encoded JSON body of one users page, cached until a user changes."""
     db = get_db()
     with db.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, first_name, last_name, date_of_birth
-            FROM users
-            ORDER BY id;
-            """
-        )
+        # fetch one extra row to know whether another page exists
+        execute_prepared(cur, 'users_list_page', (after_id, limit + 1))
         rows = cur.fetchall()
 
-    users = [
-        {
-            'id': row['id'],
-            'first_name': row['first_name'],
-            'last_name': row['last_name'],
-            'date_of_birth': row['date_of_birth'],
-        }
-        for row in rows
-    ]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['id'])
+
+    # rows already carry exactly the response keys; orjson encodes them as dicts
+    return orjson.dumps({'items': rows, 'next_cursor': next_cursor})
 
-    return jsonify(users)
 
 @bp.get('/<int:user_id>')
 def get_user(user_id: int):
     """Get a single user by id."""
+    if user_id > MAX_ID:
+        abort(404)
+
+    body = _user_body(user_id)
+    if body is None:
+        abort(404)
+
+    return current_app.response_class(body, mimetype='application/json')
+
+
+@cache.memoize(60)
+def _user_body(user_id: int) -> bytes | None:
+    """Encoded JSON body of a single user, or None if it does not exist."""
     db = get_db()
     with db.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, first_name, last_name, date_of_birth
-            FROM users
-            WHERE id = %s;
-            """,
-            (user_id,),
-        )
+        execute_prepared(cur, 'users_get', (user_id,))
         row = cur.fetchone()
 
     if row is None:
-        abort(404)
+        return None
 
-    return jsonify(
-        {
-            'id': row['id'],
-            'first_name': row['first_name'],
-            'last_name': row['last_name'],
-            'date_of_birth': row['date_of_birth'],
-        }
-    )
+    return orjson.dumps(row)